@@ -1,10 +1,35 @@
 # <TODO: Step 3 - Imports>
 # Complete the imports for all the necessary components from the semantic_kernel library.
+import argparse
+import contextlib
+import contextvars
+import cProfile
+import inspect
+import json
 import logging
+import mimetypes
 import os
+import pstats
 import asyncio
+import hashlib
+import heapq
+import itertools
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from http import HTTPStatus
+from typing import Any
+import httpx
+import matplotlib
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from dotenv import load_dotenv
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
 
 from semantic_kernel import Kernel
 from semantic_kernel.agents import ChatCompletionAgent, AgentGroupChat
@@ -42,6 +67,62 @@ def log_agent_message(content):
     except Exception:
         agent_logger.exception("Failed to write agent message to log")
 
+# 7. Per-run log files, so concurrent runs each see only their own agent messages.
+_run_log_id = contextvars.ContextVar("run_log_id", default=None)
+
+
+class RunLog:
+    """A run's agent log file, with helpers to checkpoint and replay the lines of a stage."""
+    def __init__(self, handler):
+        self.handler = handler
+
+    def tell(self):
+        """Returns the current end of the log, marking the start of a stage."""
+        self.handler.flush()
+        return os.path.getsize(self.handler.baseFilename)
+
+    def read_from(self, position):
+        """Returns everything logged since `position`."""
+        self.handler.flush()
+        with open(self.handler.baseFilename, 'rb') as f:
+            f.seek(position)
+            return f.read().decode(self.handler.encoding or 'utf-8')
+
+    def replay(self, text):
+        """Writes the lines a checkpointed stage logged back into this run's log."""
+        if not text:
+            return
+        self.handler.acquire()
+        try:
+            self.handler.stream.write(text)
+            self.handler.flush()
+        finally:
+            self.handler.release()
+
+
+@contextlib.contextmanager
+def run_agent_log(path):
+    """
+    Copies the agent log records of the current run into their own file.
+
+    Records are matched to the run through a context variable, so the file
+    only contains messages logged by this run's task and the threads it starts.
+    Yields a RunLog for the file.
+    """
+    run_id = uuid.uuid4().hex
+    token = _run_log_id.set(run_id)
+    handler = logging.FileHandler(path, mode='w')
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(chat_formatter)
+    handler.addFilter(lambda record: _run_log_id.get() == run_id)
+    agent_logger.addHandler(handler)
+    try:
+        yield RunLog(handler)
+    finally:
+        agent_logger.removeHandler(handler)
+        handler.close()
+        _run_log_id.reset(token)
+
 # -----------------
 # Environment Setup
 # -----------------
@@ -52,21 +133,480 @@ API_KEY = os.getenv("AZURE_OPENAI_KEY")
 BASE_URL = os.getenv("URL")
 API_VERSION = "2024-12-01-preview"
 
+# Request scheduling limits for the shared chat service. Leave the per-minute
+# limits unset to only cap concurrency.
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "4"))
+CHAT_REQUESTS_PER_MINUTE = float(os.getenv("CHAT_REQUESTS_PER_MINUTE", "0"))
+CHAT_TOKENS_PER_MINUTE = float(os.getenv("CHAT_TOKENS_PER_MINUTE", "0"))
+CHAT_MAX_RETRIES = int(os.getenv("CHAT_MAX_RETRIES", "5"))
+
+# Lower numbers are scheduled first: checkers unblock a whole group chat, so
+# they go ahead of the agents that generate long outputs.
+AGENT_PRIORITIES = {
+    "AnalysisChecker": 0,
+    "ReportChecker": 0,
+    "DataCleaning": 1,
+    "DataStatistics": 1,
+    "PythonExecutorAgent": 2,
+    "ReportGenerator": 2,
+}
+
+# -----------------
+# Request Scheduling
+# -----------------
+class TokenBucket:
+    """A token bucket that refills continuously up to `rate_per_minute` units."""
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount):
+        """Returns the seconds to wait until `amount` units are available."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        """Takes `amount` units; the balance may go negative to record debt."""
+        self._refill()
+        self.tokens -= amount
+
+
+def _response_status(error):
+    """Finds the HTTP status and Retry-After delay in an exception chain."""
+    while error is not None:
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            headers = getattr(getattr(error, "response", None), "headers", None) or {}
+            try:
+                retry_after = float(headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+            return status, retry_after
+        error = error.__cause__ or error.__context__
+    return None, None
+
+
+class RequestScheduler:
+    """
+    Schedules chat completion requests under concurrency and rate limits.
+
+    Requests wait in a single priority queue and are admitted only when
+    both a concurrency slot and requests/min and tokens/min capacity are
+    free, so a rate-limited queue still lets high-priority requests go
+    first and no request holds a slot while it waits for the buckets.
+    429 and 5xx responses are retried with jittered exponential backoff,
+    honoring the server's Retry-After, and a Retry-After pauses every
+    queued request, not just the failed one.
+    """
+    def __init__(self, max_concurrency=4, requests_per_minute=0, tokens_per_minute=0,
+                 max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._dispatch_timer = None
+        self.stats = {
+            "requests": 0,
+            "throttled": 0,
+            "retries": 0,
+            "failures": 0,
+            "max_queue_depth": 0,
+            "queue_wait_seconds": 0.0,
+        }
+
+    def metrics(self):
+        """Returns the current queue depth, in-flight count and counters."""
+        queue_depth = sum(not slot.done() for _, _, slot, _ in self._waiters)
+        return {"queue_depth": queue_depth, "in_flight": self._in_flight, **self.stats}
+
+    def _capacity_delay(self, estimated_tokens):
+        delay = self._paused_until - time.monotonic()
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.delay_for(1))
+        if self.token_bucket:
+            delay = max(delay, self.token_bucket.delay_for(estimated_tokens))
+        return delay
+
+    def _dispatch(self):
+        """Admits queued requests in priority order while slots and rate capacity allow."""
+        if self._dispatch_timer is not None:
+            self._dispatch_timer.cancel()
+            self._dispatch_timer = None
+        while self._waiters and self._in_flight < self.max_concurrency:
+            _, _, slot, estimated_tokens = self._waiters[0]
+            if slot.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._capacity_delay(estimated_tokens)
+            if delay > 0:
+                self._dispatch_timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket:
+                self.token_bucket.consume(estimated_tokens)
+            self._in_flight += 1
+            slot.set_result(None)
+
+    async def _acquire(self, priority, estimated_tokens):
+        slot = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), slot, estimated_tokens))
+        self._dispatch()
+        if slot.done():
+            return
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiters))
+        agent_logger.debug(f"Scheduler: queued request (priority {priority}, depth {len(self._waiters)})")
+        try:
+            await slot
+        except asyncio.CancelledError:
+            if slot.done() and not slot.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Corrects the tokens/min bucket once the real usage is known."""
+        if self.token_bucket and actual_tokens:
+            self.token_bucket.consume(actual_tokens - estimated_tokens)
+
+    async def submit(self, send, priority=1, estimated_tokens=0):
+        """
+        Sends a request through the scheduler.
+
+        Args:
+            send (callable): A coroutine function performing the request.
+            priority (int, optional): Lower values are scheduled first.
+            estimated_tokens (int, optional): Tokens charged to the tokens/min
+                bucket before the request is sent.
+
+        Returns:
+            The result of `send()`.
+        """
+        attempt = 0
+        while True:
+            queued_at = time.monotonic()
+            await self._acquire(priority, estimated_tokens)
+            try:
+                self.stats["queue_wait_seconds"] += time.monotonic() - queued_at
+                self.stats["requests"] += 1
+                return await send()
+            except Exception as e:
+                status, retry_after = _response_status(e)
+                if status != 429 and (status is None or status < 500):
+                    self.stats["failures"] += 1
+                    raise
+                if status == 429:
+                    self.stats["throttled"] += 1
+                if attempt >= self.max_retries:
+                    self.stats["failures"] += 1
+                    raise
+                backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay = retry_after if retry_after is not None else random.uniform(backoff / 2, backoff)
+                if retry_after is not None:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                logging.warning(f"Chat request failed with HTTP {status}, retrying in {delay:.1f}s")
+            finally:
+                self._release()
+            attempt += 1
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+
+def estimate_tokens(settings):
+    """Roughly estimates the tokens a chat request will use (4 chars per token)."""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in (settings.messages or []))
+    return prompt_chars // 4 + (settings.max_tokens or 1000)
+
+
+class ScheduledAzureChatCompletion(AzureChatCompletion):
+    """An AzureChatCompletion that sends every request through a RequestScheduler."""
+    scheduler: Any = None
+    priority: int = 1
+
+    async def _send_request(self, settings):
+        if self.scheduler is None:
+            return await super()._send_request(settings)
+        estimated = estimate_tokens(settings)
+        send = super()._send_request
+        response = await self.scheduler.submit(lambda: send(settings), priority=self.priority,
+                                               estimated_tokens=estimated)
+        usage = getattr(response, "usage", None)
+        self.scheduler.record_usage(estimated, getattr(usage, "total_tokens", 0))
+        return response
+
+
 # -----------------
 # Kernel and Chat Service
 # -----------------
 # <TODO: Step 3 - Kernel Initialization>
 # Initialize the Kernel, define the AzureChatCompletion service, and add it to the kernel.
+# All chat services share one pooled HTTP client and one scheduler; retries
+# are left to the scheduler so the OpenAI client does not retry on its own.
 kernel = Kernel()
-chat_service = AzureChatCompletion(
-    deployment_name="none", 
+request_scheduler = RequestScheduler(
+    max_concurrency=CHAT_MAX_CONCURRENCY,
+    requests_per_minute=CHAT_REQUESTS_PER_MINUTE,
+    tokens_per_minute=CHAT_TOKENS_PER_MINUTE,
+    max_retries=CHAT_MAX_RETRIES,
+)
+chat_client = AsyncAzureOpenAI(
     api_key=API_KEY,
     base_url=BASE_URL,
-    api_version=API_VERSION
+    api_version=API_VERSION,
+    max_retries=0,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=CHAT_MAX_CONCURRENCY * 2,
+                            max_keepalive_connections=CHAT_MAX_CONCURRENCY)
+    ),
 )
 
+
+def create_chat_service(priority=1):
+    """Creates a scheduled chat service on the shared client with the given priority."""
+    service = ScheduledAzureChatCompletion(deployment_name="none", async_client=chat_client)
+    service.scheduler = request_scheduler
+    service.priority = priority
+    return service
+
+
+chat_service = create_chat_service()
+
 kernel.add_service(chat_service)
 
+# -----------------
+# Profiling
+# -----------------
+# Opt-in per-stage profiling. Set AGENTQUANT_PROFILE (or pass --profile) to a
+# comma-separated list of modes: 'spans' records wall-clock timings,
+# 'cprofile' and 'tracemalloc' also capture function stats and allocations per
+# stage, and 'all' enables everything. When profiling is off, profile_stage()
+# costs a single context variable lookup.
+PROFILE_MODES = ("spans", "cprofile", "tracemalloc")
+AGENTQUANT_PROFILE = os.getenv("AGENTQUANT_PROFILE", "")
+
+_active_profiler = contextvars.ContextVar("active_profiler", default=None)
+_span_path = contextvars.ContextVar("span_path", default=())
+# Whether an enclosing span of the current task already captures stats.
+_capture_active = contextvars.ContextVar("capture_active", default=False)
+_no_profile = contextlib.nullcontext()
+
+# cProfile hooks are per thread and replace each other, so concurrent runs
+# sharing the event loop thread must not both enable one there.
+_profiled_threads = set()
+# tracemalloc is process-wide: it is started for the first profiler that needs
+# it and stopped when the last one finishes, unless it was already running.
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def parse_profile_modes(value):
+    """
+    Parses a profiling setting into a set of modes.
+
+    Args:
+        value (str | None): '', '0' or 'off' disable profiling; '1', 'on' or
+            'spans' enable timings only; 'all' enables every mode; otherwise
+            a comma-separated list of PROFILE_MODES.
+
+    Returns:
+        set[str]: The enabled modes, empty when profiling is disabled.
+    """
+    value = (value or "").strip().lower()
+    if value in ("", "0", "off", "false", "no"):
+        return set()
+    if value in ("1", "on", "true", "yes"):
+        return {"spans"}
+    if value == "all":
+        return set(PROFILE_MODES)
+    modes = {mode.strip() for mode in value.split(",") if mode.strip()}
+    unknown = modes - set(PROFILE_MODES)
+    if unknown:
+        raise ValueError(f"Unknown profile modes: {', '.join(sorted(unknown))}")
+    return modes | {"spans"}
+
+
+class StageProfiler:
+    """
+    Records timing spans, and optionally cProfile stats and tracemalloc
+    allocation diffs, for the stages of one workflow run.
+
+    cProfile only sees the thread a stage starts on, and while a stage awaits
+    the model it also sees any other task the event loop runs. When several
+    runs share the event loop, pass capture_async=False so stages running on
+    the loop are only timed, and only stages on worker threads are captured.
+    """
+    def __init__(self, modes, capture_async=True):
+        self.modes = set(modes)
+        self.capture_async = capture_async
+        self.spans = []
+        self.captures = []
+        self.origin = time.perf_counter()
+        self._uses_tracemalloc = "tracemalloc" in self.modes
+        if self._uses_tracemalloc:
+            _acquire_tracemalloc()
+
+    @contextlib.contextmanager
+    def span(self, name, capture=True):
+        """
+        Times the enclosed block as a child of the current span.
+
+        With capture, cProfile and tracemalloc data are also recorded for the
+        block, unless an enclosing span of the same task already records them.
+        """
+        path = _span_path.get() + (name,)
+        token = _span_path.set(path)
+        capture = (capture and not _capture_active.get()
+                   and bool(self.modes & {"cprofile", "tracemalloc"})
+                   and (self.capture_async or not _on_event_loop()))
+        profile = snapshot = capture_token = None
+        thread_id = threading.get_ident()
+        if capture:
+            capture_token = _capture_active.set(True)
+            if "cprofile" in self.modes and thread_id not in _profiled_threads:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                    _profiled_threads.add(thread_id)
+                except ValueError:
+                    # Another profiler is already active (Python 3.12+).
+                    profile = None
+            if "tracemalloc" in self.modes and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                _profiled_threads.discard(thread_id)
+            allocations = None
+            if snapshot is not None and tracemalloc.is_tracing():
+                allocations = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")[:20]
+            if capture:
+                _capture_active.reset(capture_token)
+                self.captures.append((len(self.spans), name, profile, allocations))
+            self.spans.append({
+                "name": name,
+                "path": list(path),
+                "start": start - self.origin,
+                "duration": duration,
+                "thread": threading.current_thread().name,
+            })
+            _span_path.reset(token)
+
+    def folded_stacks(self):
+        """
+        Returns the spans in the collapsed stack format read by flamegraph.pl,
+        inferno and speedscope: one 'a;b;c <self time in microseconds>' line
+        per distinct span path.
+        """
+        totals = {}
+        children = {}
+        for span in self.spans:
+            path = tuple(span["path"])
+            totals[path] = totals.get(path, 0.0) + span["duration"]
+            if len(path) > 1:
+                children[path[:-1]] = children.get(path[:-1], 0.0) + span["duration"]
+        lines = []
+        for path, total in totals.items():
+            self_time = max(0.0, total - children.get(path, 0.0))
+            lines.append(f"{';'.join(path)} {int(self_time * 1e6)}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Releases this profiler's hold on tracemalloc."""
+        if self._uses_tracemalloc:
+            self._uses_tracemalloc = False
+            _release_tracemalloc()
+
+    def write_bundle(self, directory):
+        """
+        Writes the profile bundle to `directory`:
+        spans.json, stacks.folded, and per captured stage a .pstats file with a
+        text summary and/or a .tracemalloc.txt allocation report.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "spans.json"), "w") as f:
+            json.dump({"modes": sorted(self.modes), "spans": self.spans}, f, indent=2)
+        with open(os.path.join(directory, "stacks.folded"), "w") as f:
+            f.write(self.folded_stacks())
+        for index, name, profile, allocations in self.captures:
+            prefix = os.path.join(directory, f"{index:03d}-{name}")
+            if profile is not None:
+                profile.dump_stats(f"{prefix}.pstats")
+                with open(f"{prefix}.txt", "w") as f:
+                    pstats.Stats(profile, stream=f).sort_stats("cumulative").print_stats(30)
+            if allocations is not None:
+                with open(f"{prefix}.tracemalloc.txt", "w") as f:
+                    f.write("\n".join(str(stat) for stat in allocations) + "\n")
+        logging.info(f"Profile bundle written to {directory}")
+
+
+def profile_stage(name):
+    """
+    Returns a context manager that profiles the enclosed block as stage `name`
+    when profiling is active, and does nothing otherwise.
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return _no_profile
+    return profiler.span(name)
+
+
+def run_profiled(name, func, *args, **kwargs):
+    """Calls `func` inside a profile_stage, e.g. on a worker thread via asyncio.to_thread()."""
+    with profile_stage(name):
+        return func(*args, **kwargs)
+
+
 # -----------------
 # Helper Functions
 # -----------------
@@ -116,20 +656,21 @@ def load_reports_instructions(file_path):
                 return instructions
     return []
 
-def load_logs(file_path):
+def load_logs(file_path, directory='logs'):
     """
     Loads agent interaction logs from a file within the 'logs' directory.
 
     Args:
         file_path (str): The name of the log file in the 'logs' directory.
+        directory (str, optional): The directory to look in. Defaults to 'logs'.
 
     Returns:
         list[str]: A list of log entries. Returns an empty list if the file
                    does not exist.
     """
-    for file in os.listdir('logs'):
+    for file in os.listdir(directory):
         if file == file_path:
-            with open(os.path.join('logs', file_path), 'r') as f:
+            with open(os.path.join(directory, file_path), 'r') as f:
                 lines = f.readlines()
                 logs = [line.strip() for line in lines if line.strip()]
                 return logs
@@ -208,7 +749,8 @@ class PythonExecutor:
         for attempt in range(self.max_attempts):
             try:
                 local_scope = {}
-                exec(code, {}, local_scope)
+                with profile_stage("executor"):
+                    exec(code, {}, local_scope)
                 return True, None
             except Exception as e:
                 logging.error(f"Execution attempt {attempt + 1} failed: {e}")
@@ -234,6 +776,249 @@ def save_final_report(report, path='artifacts/final_report.md'):
     
 
 
+# -----------------
+# Outlier Detection
+# -----------------
+# Detectors take a 1-D float array and return a boolean outlier mask of the
+# same length; NaNs are never flagged. The rolling variants compare each point
+# against a centered window, which suits trending or drifting series where a
+# single global threshold flags the trend instead of the spikes.
+OUTLIER_DETECTORS = {}
+
+# Datasets whose level moves over time default to a rolling detector; every
+# other file uses the global IQR method.
+DATASET_DETECTORS = {
+    "data-Stock-1.csv": "rolling_hampel",
+    "data-Stock-2.csv": "rolling_hampel",
+    "data-Sensor-3.csv": "rolling_hampel",
+}
+
+# Numeric columns with these names are positions, not measurements.
+INDEX_COLUMN_NAMES = {"date", "time", "timestamp", "index"}
+
+# Rows per block when materializing sliding windows, bounding memory use.
+_WINDOW_CHUNK = 1 << 18
+
+
+def register_detector(name):
+    """Registers an outlier detector under `name` in OUTLIER_DETECTORS."""
+    def decorator(func):
+        OUTLIER_DETECTORS[name] = func
+        return func
+    return decorator
+
+
+def _finite(values):
+    """Splits an array into its finite values and the mask selecting them."""
+    values = np.asarray(values, dtype=float)
+    keep = np.isfinite(values)
+    return values[keep], keep
+
+
+def _expand(mask, keep):
+    full = np.zeros(keep.shape, dtype=bool)
+    full[keep] = mask
+    return full
+
+
+@register_detector("iqr")
+def detect_iqr(values, k=1.5):
+    """Flags values outside [Q1 - k*IQR, Q3 + k*IQR] of the whole series."""
+    x, keep = _finite(values)
+    if not len(x):
+        return _expand(x.astype(bool), keep)
+    q1, q3 = np.percentile(x, [25, 75])
+    iqr = q3 - q1
+    return _expand((x < q1 - k * iqr) | (x > q3 + k * iqr), keep)
+
+
+@register_detector("zscore")
+def detect_zscore(values, threshold=3.0):
+    """Flags values more than `threshold` standard deviations from the mean."""
+    x, keep = _finite(values)
+    std = x.std() if len(x) else 0.0
+    if std == 0:
+        return _expand(np.zeros(len(x), dtype=bool), keep)
+    return _expand(np.abs(x - x.mean()) > threshold * std, keep)
+
+
+@register_detector("mad")
+def detect_mad(values, threshold=3.5):
+    """Flags values whose modified z-score (based on the MAD) exceeds `threshold`."""
+    x, keep = _finite(values)
+    if not len(x):
+        return _expand(x.astype(bool), keep)
+    median = np.median(x)
+    mad = np.median(np.abs(x - median))
+    if mad == 0:
+        return _expand(np.zeros(len(x), dtype=bool), keep)
+    return _expand(0.6745 * np.abs(x - median) / mad > threshold, keep)
+
+
+def _edge_positions(n, window):
+    """Returns the positions whose centered window of odd size `window` is truncated."""
+    half = window // 2
+    return list(range(min(half, n))) + list(range(max(half, n - half), n))
+
+
+def _rolling_quantiles(x, window, quantiles):
+    """
+    Computes linearly interpolated quantiles of each centered window.
+
+    Interior windows are sorted block by block on strided views, so every
+    quantile comes from one vectorized sort and memory stays bounded; the few
+    truncated windows at the edges are computed directly.
+
+    Returns:
+        np.ndarray: One row per quantile, one column per value of `x`.
+    """
+    n = len(x)
+    half = window // 2
+    result = np.empty((len(quantiles), n))
+    for i in _edge_positions(n, window):
+        result[:, i] = np.quantile(x[max(0, i - half):i + half + 1], quantiles)
+    if n >= window:
+        positions = [q * (window - 1) for q in quantiles]
+        views = sliding_window_view(x, window)
+        for start in range(0, len(views), _WINDOW_CHUNK):
+            block = np.sort(views[start:start + _WINDOW_CHUNK], axis=1)
+            rows = slice(start + half, start + half + len(block))
+            for row, position in enumerate(positions):
+                low = int(position)
+                high = min(low + 1, window - 1)
+                result[row, rows] = block[:, low] + (position - low) * (block[:, high] - block[:, low])
+    return result
+
+
+def _rolling_mad(x, medians, window):
+    """
+    Computes each centered window's median absolute deviation from its median.
+
+    Interior windows are evaluated block by block on strided views; the window
+    is odd, so each median is a single partition. The few truncated windows at
+    the edges are computed directly.
+    """
+    n = len(x)
+    half = window // 2
+    mad = np.empty(n)
+    for i in _edge_positions(n, window):
+        window_values = x[max(0, i - half):i + half + 1]
+        mad[i] = np.median(np.abs(window_values - medians[i]))
+    if n >= window:
+        views = sliding_window_view(x, window)
+        for start in range(0, len(views), _WINDOW_CHUNK):
+            block = views[start:start + _WINDOW_CHUNK]
+            centers = medians[start + half:start + half + len(block)]
+            deviations = np.partition(np.abs(block - centers[:, None]), half, axis=1)
+            mad[start + half:start + half + len(block)] = deviations[:, half]
+    return mad
+
+
+@register_detector("rolling_hampel")
+def detect_rolling_hampel(values, window=11, n_sigmas=3.0):
+    """
+    Hampel filter: flags values more than `n_sigmas` scaled MADs from the
+    median of the centered window around them.
+    """
+    x, keep = _finite(values)
+    window = max(3, window | 1)
+    medians = _rolling_quantiles(x, window, [0.5])[0]
+    scale = 1.4826 * _rolling_mad(x, medians, window)
+    return _expand((scale > 0) & (np.abs(x - medians) > n_sigmas * scale), keep)
+
+
+@register_detector("rolling_iqr")
+def detect_rolling_iqr(values, window=15, k=1.5):
+    """Flags values outside [Q1 - k*IQR, Q3 + k*IQR] of the centered window around them."""
+    x, keep = _finite(values)
+    window = max(3, window | 1)
+    q1, q3 = _rolling_quantiles(x, window, [0.25, 0.75])
+    iqr = q3 - q1
+    return _expand((x < q1 - k * iqr) | (x > q3 + k * iqr), keep)
+
+
+def select_detector(csv_path, override=None):
+    """Returns the detector name to use for a dataset."""
+    name = override or DATASET_DETECTORS.get(os.path.basename(csv_path), "iqr")
+    if name not in OUTLIER_DETECTORS:
+        raise ValueError(f"Unknown outlier detector '{name}'. Available: {', '.join(OUTLIER_DETECTORS)}")
+    return name
+
+
+def load_csv_dataframe(file_path):
+    """Reads a CSV file into a DataFrame, returning an empty one on error."""
+    try:
+        return pd.read_csv(file_path)
+    except Exception as e:
+        logging.error(f"Error loading CSV file {file_path}: {e}")
+    return pd.DataFrame()
+
+
+def measurement_columns(df):
+    """Returns the numeric columns of a DataFrame that hold measurements."""
+    return [
+        column for column in df.select_dtypes(include="number").columns
+        if str(column).strip().lower() not in INDEX_COLUMN_NAMES
+    ]
+
+
+def detect_outliers(df, method="iqr", **params):
+    """
+    Runs an outlier detector over every measurement column of a DataFrame.
+
+    Args:
+        df (pd.DataFrame): The data to check.
+        method (str, optional): A name registered in OUTLIER_DETECTORS.
+        **params: Keyword arguments passed to the detector.
+
+    Returns:
+        dict[str, np.ndarray]: A boolean outlier mask per measurement column.
+    """
+    detector = OUTLIER_DETECTORS[method]
+    return {column: detector(df[column].to_numpy(), **params) for column in measurement_columns(df)}
+
+
+def build_cleaning_report(df, outliers, method):
+    """
+    Builds the precomputed cleaning results for the DataCleaning agent.
+
+    A row is removed if any of its measurement columns is an outlier. The
+    agent already receives the CSV, so the cleaned rows are not repeated;
+    the removed rows are listed by their 0-based position instead.
+
+    Args:
+        df (pd.DataFrame): The original data.
+        outliers (dict[str, np.ndarray]): Outlier masks from detect_outliers().
+        method (str): The detector name, recorded in the output.
+
+    Returns:
+        dict: The cleaning result in the DataCleaning output format, with
+              'removed_rows' in place of the cleaned values.
+    """
+    removed = np.zeros(len(df), dtype=bool)
+    for mask in outliers.values():
+        removed |= mask
+    return {
+        "method": method,
+        "original_data": {
+            "row_count": len(df),
+            "columns": [str(column) for column in df.columns],
+            "sample_values": json.loads(df.head(5).to_json(orient="records")),
+        },
+        "outliers_detected": {
+            str(column): df.loc[mask, column].tolist() for column, mask in outliers.items()
+        },
+        "cleaned_data": {
+            "row_count": int(len(df) - removed.sum()),
+            "removed_rows": np.flatnonzero(removed).tolist(),
+        },
+        "removal_summary": {
+            "total_outliers_removed": int(removed.sum()),
+            "by_column": {str(column): int(mask.sum()) for column, mask in outliers.items()},
+        },
+    }
+
+
 # -----------------
 # Agent Instructions
 # -----------------
@@ -265,7 +1050,7 @@ AGENT_CONFIG = {
     - Include a legend showing "Original Data" and "Clean Data"
     - Use different colors for each line (e.g., blue for original, green for clean)
     - Rotate x-axis labels for better readability
-    - Save the figure to 'artifacts/data_visualization.png' using plt.savefig(dpi=150, bbox_inches='tight')
+    - Save the figure to the exact path given in the request using plt.savefig(dpi=150, bbox_inches='tight')
     - Call plt.close() after saving to free memory
 
     Output Format:
@@ -280,15 +1065,20 @@ AGENT_CONFIG = {
 
     Agent Instructions:
     1. Parse the provided CSV data and identify all numeric columns.
-    2. For each numeric column, detect outliers using the IQR method:
+    2. If precomputed cleaning results are provided, use them as your output unchanged;
+       they were computed locally with the detection method they name. Instead of the
+       cleaned values they list "removed_rows", the 0-based positions of the removed CSV
+       rows; fill "cleaned_data.values" with the CSV rows that are not in that list.
+    3. Otherwise, for each numeric column, detect outliers using the IQR method:
        - Calculate Q1 (25th percentile) and Q3 (75th percentile)
        - Calculate IQR = Q3 - Q1
        - Identify outliers as values < Q1 - 1.5*IQR or > Q3 + 1.5*IQR
-    3. Remove identified outliers from the dataset.
-    4. Document all removed values with their original positions.
+    4. Remove identified outliers from the dataset.
+    5. Document all removed values with their original positions.
 
     Output Format - MUST be valid JSON:
     {
+        "method": "<detection method>",
         "original_data": {
             "row_count": <number>,
             "columns": [...],
@@ -359,7 +1149,7 @@ AGENT_CONFIG = {
     Validation Tasks:
     1. Outlier Removal Check:
        - Verify that the cleaned dataset contains no values previously marked as outliers
-       - Confirm outlier detection method was applied correctly (IQR method)
+       - Confirm the outlier detection method named in the cleaning results was applied (IQR by default)
 
     2. Statistical Validity Check:
        - Confirm descriptive statistics (mean, median, std, min, max) are computed using cleaned data only
@@ -411,7 +1201,7 @@ AGENT_CONFIG = {
        - Complete all tables with actual data
 
     3. Include the visualization reference:
-       - Use: ![Data Visualization](artifacts/data_visualization.png)
+       - Use: ![Data Visualization](<visualization path given in the request>)
 
     4. Document the agent workflow in the summary table:
        - List each agent that participated
@@ -451,7 +1241,7 @@ AGENT_CONFIG = {
        - Proper markdown formatting
        - All placeholders have been replaced with actual values
        - Tables are properly formatted
-       - Image reference uses correct path: artifacts/data_visualization.png
+       - Image reference uses the visualization path given in the report request
 
     Decision Logic:
     - If ALL sections are complete and accurate → output: "Approved"
@@ -488,14 +1278,14 @@ def create_agent(name, instructions, service, settings=None):
         kernel_args = KernelArguments(settings=settings)
         return ChatCompletionAgent(
             kernel=kernel,
-            service=chat_service,
+            service=service,
             name=name,
             instructions=instructions,
             arguments=kernel_args
         )
     return ChatCompletionAgent(
         kernel=kernel,
-        service=chat_service,
+        service=service,
         name=name,
         instructions=instructions
     )
@@ -524,7 +1314,7 @@ class ApprovalTerminationStrategy(TerminationStrategy):
 python_agent = create_agent(
     name="PythonExecutorAgent",
     instructions=AGENT_CONFIG["PythonExecutorAgent"],
-    service=chat_service,
+    service=create_chat_service(AGENT_PRIORITIES["PythonExecutorAgent"]),
     settings=OpenAIChatPromptExecutionSettings(temperature=0.0)
 )
 
@@ -532,7 +1322,7 @@ python_agent = create_agent(
 cleaning_agent = create_agent(
     name="DataCleaning",
     instructions=AGENT_CONFIG["DataCleaning"],
-    service=chat_service,
+    service=create_chat_service(AGENT_PRIORITIES["DataCleaning"]),
     settings=OpenAIChatPromptExecutionSettings(temperature=0.3)
 )
 
@@ -540,7 +1330,7 @@ cleaning_agent = create_agent(
 stats_agent = create_agent(
     name="DataStatistics",
     instructions=AGENT_CONFIG["DataStatistics"],
-    service=chat_service,
+    service=create_chat_service(AGENT_PRIORITIES["DataStatistics"]),
     settings=OpenAIChatPromptExecutionSettings(temperature=0.1)
 )
 
@@ -548,7 +1338,7 @@ stats_agent = create_agent(
 checker_agent = create_agent(
     name="AnalysisChecker",
     instructions=AGENT_CONFIG["AnalysisChecker"],
-    service=chat_service,
+    service=create_chat_service(AGENT_PRIORITIES["AnalysisChecker"]),
     settings=OpenAIChatPromptExecutionSettings(temperature=0.0)
 )
 
@@ -556,7 +1346,7 @@ checker_agent = create_agent(
 report_agent = create_agent(
     name="ReportGenerator",
     instructions=AGENT_CONFIG["ReportGenerator"],
-    service=chat_service,
+    service=create_chat_service(AGENT_PRIORITIES["ReportGenerator"]),
     settings=OpenAIChatPromptExecutionSettings(temperature=0.5)
 )
 
@@ -564,7 +1354,7 @@ report_agent = create_agent(
 report_checker_agent = create_agent(
     name="ReportChecker",
     instructions=AGENT_CONFIG["ReportChecker"],
-    service=chat_service,
+    service=create_chat_service(AGENT_PRIORITIES["ReportChecker"]),
     settings=OpenAIChatPromptExecutionSettings(temperature=0.0)
 )
 
@@ -574,112 +1364,668 @@ report_checker_agent = create_agent(
 # -----------------
 # <TODO: Step 5 - Build the Agents and Teams>
 # 4. Create the three agent group chats.
-analysis_chat = AgentGroupChat(
-    agents=[cleaning_agent, stats_agent, checker_agent],
-    termination_strategy=ApprovalTerminationStrategy(
-        agents=[checker_agent],
-        maximum_iterations=10
+def create_group_chats():
+    """Creates a fresh set of the three agent group chats.
+
+    The agents themselves are stateless and shared, but each AgentGroupChat
+    carries its own chat history, so every workflow run needs new instances.
+
+    Returns:
+        tuple[AgentGroupChat, AgentGroupChat, AgentGroupChat]: The analysis,
+            code and report chats, in that order.
+    """
+    analysis_chat = AgentGroupChat(
+        agents=[cleaning_agent, stats_agent, checker_agent],
+        termination_strategy=ApprovalTerminationStrategy(
+            agents=[checker_agent],
+            maximum_iterations=10
+        )
     )
-)
 
-code_chat = AgentGroupChat(
-    agents=[python_agent],
-    termination_strategy=ApprovalTerminationStrategy(
+    code_chat = AgentGroupChat(
         agents=[python_agent],
-        maximum_iterations=5
+        termination_strategy=ApprovalTerminationStrategy(
+            agents=[python_agent],
+            maximum_iterations=5
+        )
     )
-)
 
-report_chat = AgentGroupChat(
-    agents=[report_agent, report_checker_agent],
-    termination_strategy=ApprovalTerminationStrategy(
-        agents=[report_checker_agent],
-        maximum_iterations=10
+    report_chat = AgentGroupChat(
+        agents=[report_agent, report_checker_agent],
+        termination_strategy=ApprovalTerminationStrategy(
+            agents=[report_checker_agent],
+            maximum_iterations=10
+        )
     )
-)
+    return analysis_chat, code_chat, report_chat
 
 
 # -----------------
-# Main Workflow
+# Checkpoints
 # -----------------
-# <TODO: Step 6 - Orchestrate the Main Workflow>
-# Implement the main workflow logic, following the sequence described in the instructions.
-async def main():
-    """The main entry point for the agentic workflow."""
-    # 1. Load the CSV data.
-    csv_path = get_csv_name()
-    csv_data = load_csv_file(csv_path)
-    print(f"Loaded data from {csv_path}")
+# Each workflow stage stores its result under a key hashed from the input
+# data, the agent prompts and settings, and the result of the stage before
+# it, so a rerun skips every stage whose inputs have not changed.
+CHECKPOINT_VERSION = 2
+WORKFLOW_AGENTS = [cleaning_agent, stats_agent, checker_agent, python_agent, report_agent, report_checker_agent]
 
-    # 2. Invoke the analysis chat.
-    print("\n--- Starting Analysis Chat ---")
-    await analysis_chat.add_chat_message(
-        message=f"Please analyze and clean this CSV data, then compute statistics:\n{csv_data}"
-    )
 
-    analysis_result = None
-    async for content in analysis_chat.invoke():
-        log_agent_message(content)
-        print(f"{content.name}: {content.content[:200]}..." if len(content.content) > 200 else f"{content.name}: {content.content}")
-        analysis_result = content.content
+def atomic_write(path, data):
+    """
+    Writes text or bytes to a file atomically.
 
-    # 3. Get human approval.
-    print("\n--- Analysis Complete ---")
-    print("Please review the analysis results above.")
-    approval = input("Do you approve the cleaned data? (yes/no): ").strip().lower()
+    The data is written to a temporary file in the same directory and moved
+    into place, so readers never see a partially written file.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _agent_fingerprint(agent):
+    settings = agent.arguments.execution_settings if agent.arguments else {}
+    return {
+        "name": agent.name,
+        "instructions": agent.instructions,
+        "settings": {key: value.model_dump(mode="json", exclude_none=True) for key, value in settings.items()},
+    }
 
-    if approval != "yes":
-        print("Analysis not approved. Exiting workflow.")
-        return
 
-    # 4. Save the cleaned data.
-    print("\n--- Saving Cleaned Data ---")
-    with open("artifacts/cleaned_data.txt", "w") as f:
-        f.write(analysis_result)
-    print("Cleaned data saved to artifacts/cleaned_data.txt")
-
-    # 5. Invoke the code chat to generate and execute visualization code.
-    print("\n--- Starting Code Chat ---")
-    await code_chat.add_chat_message(
-        message=f"Generate Python visualization code for this cleaned data. Save the plot to 'artifacts/data_visualization.png':\n{analysis_result}"
-    )
+def workflow_fingerprint(csv_path, **options):
+    """
+    Hashes everything that determines the outcome of the analysis stage.
+
+    Args:
+        csv_path (str): The path to the CSV file being analyzed.
+        **options: Any further settings that change the workflow's output.
 
-    generated_code = None
-    async for content in code_chat.invoke():
-        log_agent_message(content)
-        print(f"{content.name}: Generated code")
-        generated_code = content.content
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(json.dumps({
+        "version": CHECKPOINT_VERSION,
+        "agents": [_agent_fingerprint(agent) for agent in WORKFLOW_AGENTS],
+        "options": options,
+    }, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
 
-    # 6. Execute the code in a retry loop.
-    print("\n--- Executing Visualization Code ---")
-    executor = PythonExecutor(max_attempts=3)
 
-    # Extract code block if wrapped in markdown
-    code_to_run = generated_code
+def checkpoint_key(stage, *inputs):
+    """Derives a stage's checkpoint key from its JSON-serializable inputs."""
+    return hashlib.sha256(json.dumps([stage, *inputs], sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CheckpointStore:
+    """
+    A directory of content-addressed stage checkpoints.
+
+    Checkpoints are JSON files named after their key and written atomically;
+    a file that is missing, unreadable or recorded for another stage is
+    treated as absent.
+    """
+    def __init__(self, directory, enabled=True):
+        self.directory = directory
+        self.enabled = enabled
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, stage, key):
+        """Returns the stored payload for a stage, or None if there is none."""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(key), 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("stage") != stage or record.get("key") != key:
+            return None
+        logging.info(f"Resuming {stage} stage from checkpoint {key[:12]}")
+        return record.get("payload")
+
+    def save(self, stage, key, payload):
+        """Stores a stage's payload under its key."""
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        record = {"stage": stage, "key": key, "created_at": time.time(), "payload": payload}
+        atomic_write(self._path(key), json.dumps(record))
+
+
+# -----------------
+# Columnar Artifacts
+# -----------------
+# The original, cleaned and removed tables and the cleaned-data statistics are
+# also written as one uncompressed .npy file per column, so downstream jobs can
+# memory-map them instead of parsing the JSON in cleaned_data.txt. A new
+# version is written to its own directory and then published by atomically
+# replacing manifest.json, so readers never see a half-written set. The
+# previous version is always kept, and older ones are pruned once they are
+# older than COLUMNAR_RETENTION_SECONDS, so open readers keep working.
+# The tables are rebuilt from the local detector's masks, not parsed from the
+# agents' reply, so the manifest records how they compare to the approved result.
+COLUMNAR_FORMAT_VERSION = 2
+COLUMNAR_RETENTION_SECONDS = 3600
+STATISTICS_FIELDS = ("count", "mean", "median", "std_dev", "min", "max", "q1", "q3")
+
+
+def compute_statistics(df, columns):
+    """
+    Computes the DataStatistics agent's descriptive statistics locally.
+
+    Args:
+        df (pd.DataFrame): The cleaned data.
+        columns (list[str]): The measurement columns to describe.
+
+    Returns:
+        dict[str, dict[str, float]]: Statistics per column, keyed like the
+            agent's "statistics" output.
+    """
+    def number(value):
+        # Empty or single-value columns give NaN, which is not valid JSON.
+        return None if pd.isna(value) else float(value)
+
+    statistics = {}
+    for column in columns:
+        values = df[column].dropna()
+        statistics[str(column)] = {
+            "count": int(values.count()),
+            "mean": number(values.mean()),
+            "median": number(values.median()),
+            "std_dev": number(values.std()),
+            "min": number(values.min()),
+            "max": number(values.max()),
+            "q1": number(values.quantile(0.25)),
+            "q3": number(values.quantile(0.75)),
+        }
+    return statistics
+
+
+def _columnar_array(series):
+    """
+    Converts a column to an array that np.load can memory-map (no object dtype).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray | None]: The values and, if the column has
+            missing values, a boolean mask of them. Missing strings are stored
+            as "" and missing numbers as NaN.
+    """
+    missing = series.isna().to_numpy()
+    nulls = missing if missing.any() else None
+    if series.dtype.kind in "biuf":
+        return series.to_numpy(), nulls
+    return series.where(~missing, "").astype(str).to_numpy(dtype=str), nulls
+
+
+def approved_row_count(analysis_result):
+    """
+    Finds the cleaned row count reported in an approved analysis result.
+
+    The result is the agents' reply text; the first JSON object in it that
+    has a "cleaned_data" entry with a "row_count", at any depth, is used.
+
+    Returns:
+        int | None: The row count, or None if the result does not report one.
+    """
+    def find(value):
+        if isinstance(value, dict):
+            cleaned = value.get("cleaned_data")
+            if isinstance(cleaned, dict) and isinstance(cleaned.get("row_count"), int):
+                return cleaned["row_count"]
+            value = list(value.values())
+        if isinstance(value, list):
+            for item in value:
+                found = find(item)
+                if found is not None:
+                    return found
+        return None
+
+    decoder = json.JSONDecoder()
+    text = analysis_result or ""
+    start = text.find("{")
+    while start != -1:
+        try:
+            found = find(decoder.raw_decode(text, start)[0])
+        except ValueError:
+            found = None
+        if found is not None:
+            return found
+        start = text.find("{", start + 1)
+    return None
+
+
+def write_columnar_artifacts(directory, df, outliers, method, fingerprint=None, approved_rows=None):
+    """
+    Writes the cleaning tables and statistics in columnar form.
+
+    Args:
+        directory (str): The columnar artifacts directory, e.g. 'artifacts/columnar'.
+        df (pd.DataFrame): The original data.
+        outliers (dict[str, np.ndarray]): Outlier masks from detect_outliers().
+        method (str): The detector that produced the masks.
+        fingerprint (str, optional): A key of the inputs and the approved
+            result, recorded so unchanged data is not rewritten.
+        approved_rows (int, optional): The cleaned row count of the approved
+            analysis result. A mismatch with the detector's cleaned table is
+            logged as a warning and recorded in the manifest.
+
+    Returns:
+        dict: The published manifest.
+    """
+    removed = np.zeros(len(df), dtype=bool)
+    for mask in outliers.values():
+        removed |= mask
+    statistics = compute_statistics(df[~removed], list(outliers))
+    cleaned_rows = int(len(df) - removed.sum())
+    matches = None if approved_rows is None else approved_rows == cleaned_rows
+    if matches is False:
+        logging.warning(f"Columnar cleaned table has {cleaned_rows} rows, but the approved "
+                        f"analysis reports {approved_rows}")
+    tables = {
+        "original": df,
+        "cleaned": df[~removed],
+        "removed": df[removed],
+        "statistics": pd.DataFrame(
+            [{"column": column, **values} for column, values in statistics.items()],
+            columns=["column", *STATISTICS_FIELDS],
+        ).astype({field: float for field in STATISTICS_FIELDS}),
+    }
+
+    data_dir = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    manifest = {
+        "format": "agentquant-columnar",
+        "version": COLUMNAR_FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "method": method,
+        "source": "detector",
+        "approved_cleaned_rows": approved_rows,
+        "matches_approved_result": matches,
+        "created_at": time.time(),
+        "data_dir": data_dir,
+        "tables": {},
+        "statistics": statistics,
+    }
+    for name, table in tables.items():
+        table_dir = os.path.join(directory, data_dir, name)
+        os.makedirs(table_dir, exist_ok=True)
+        columns = []
+        for index, column in enumerate(table.columns):
+            array, nulls = _columnar_array(table[column])
+            file_name = f"{index:03d}.npy"
+            np.save(os.path.join(table_dir, file_name), array, allow_pickle=False)
+            nulls_name = None
+            if nulls is not None:
+                nulls_name = f"{index:03d}.nulls.npy"
+                np.save(os.path.join(table_dir, nulls_name), nulls, allow_pickle=False)
+            columns.append({"name": str(column), "file": file_name, "dtype": array.dtype.str,
+                            "nulls": nulls_name})
+        manifest["tables"][name] = {"rows": len(table), "columns": columns}
+
+    previous = read_columnar_manifest(directory).get("data_dir")
+    atomic_write(os.path.join(directory, "manifest.json"), json.dumps(manifest, indent=2, allow_nan=False))
+    _prune_columnar_versions(directory, keep={data_dir, previous})
+    logging.info(f"Columnar artifacts saved to {os.path.join(directory, data_dir)}")
+    return manifest
+
+
+def _prune_columnar_versions(directory, keep):
+    """Removes version directories not in `keep` that are older than the retention period."""
+    cutoff = time.time() - COLUMNAR_RETENTION_SECONDS
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name in keep or not os.path.isdir(path):
+            continue
+        if os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_columnar_manifest(directory):
+    """Returns the current columnar manifest, or an empty dict if there is none."""
+    try:
+        with open(os.path.join(directory, "manifest.json"), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class ColumnarArtifacts:
+    """
+    Lazy, read-only access to a published set of columnar artifacts.
+
+    Every column is memory-mapped when the reader is created, which reads no
+    data yet but pins the files, so the reader stays valid after a newer
+    version is published and this one is pruned. Data is paged in only for
+    the columns that are accessed. Columns with missing values have a null
+    mask, see nulls().
+    """
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self._columns = {}
+        self._nulls = {}
+        for table in self.tables:
+            for column in self.manifest["tables"][table]["columns"]:
+                self.column(table, column["name"])
+                self.nulls(table, column["name"])
+
+    @property
+    def tables(self):
+        """The names of the available tables."""
+        return list(self.manifest["tables"])
+
+    @property
+    def statistics(self):
+        """The descriptive statistics of the cleaned data, per column."""
+        return self.manifest["statistics"]
+
+    def _spec(self, table, name):
+        spec = next((column for column in self.manifest["tables"][table]["columns"] if column["name"] == name), None)
+        if spec is None:
+            raise KeyError(f"Table '{table}' has no column '{name}'")
+        return spec
+
+    def _load(self, table, file_name):
+        path = os.path.join(self.directory, self.manifest["data_dir"], table, file_name)
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+
+    def column(self, table, name):
+        """Returns one column of a table as a read-only memory-mapped array."""
+        key = (table, name)
+        if key not in self._columns:
+            self._columns[key] = self._load(table, self._spec(table, name)["file"])
+        return self._columns[key]
+
+    def nulls(self, table, name):
+        """Returns a column's memory-mapped missing-value mask, or None if it has no missing values."""
+        key = (table, name)
+        if key not in self._nulls:
+            file_name = self._spec(table, name)["nulls"]
+            self._nulls[key] = self._load(table, file_name) if file_name else None
+        return self._nulls[key]
+
+    def table(self, table):
+        """Returns a table as a dict of memory-mapped column arrays."""
+        return {column["name"]: self.column(table, column["name"]) for column in self.manifest["tables"][table]["columns"]}
+
+    def to_dataframe(self, table):
+        """Returns a table as a pandas DataFrame with missing values restored (this copies the data)."""
+        df = pd.DataFrame(self.table(table))
+        for column in df.columns:
+            nulls = self.nulls(table, column)
+            if nulls is not None:
+                df[column] = df[column].where(~np.asarray(nulls))
+        return df
+
+
+def load_columnar_artifacts(directory="artifacts/columnar"):
+    """
+    Opens the columnar artifacts written by write_columnar_artifacts().
+
+    Args:
+        directory (str, optional): The columnar artifacts directory.
+            Defaults to 'artifacts/columnar'.
+
+    Returns:
+        ColumnarArtifacts: A lazy reader for the current version.
+
+    Raises:
+        FileNotFoundError: If no columnar artifacts have been published.
+        ValueError: If the manifest has an unsupported format version.
+    """
+    manifest = read_columnar_manifest(directory)
+    if not manifest:
+        raise FileNotFoundError(f"No columnar artifacts found in {directory}")
+    if manifest.get("version") != COLUMNAR_FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar artifacts version: {manifest.get('version')}")
+    return ColumnarArtifacts(directory, manifest)
+
+
+# -----------------
+# Main Workflow
+# -----------------
+# <TODO: Step 6 - Orchestrate the Main Workflow>
+# Implement the main workflow logic, following the sequence described in the instructions.
+# Serializes generated plotting code: matplotlib's pyplot keeps global state,
+# so two scripts must never draw at the same time. The code runs on a worker
+# thread, where GUI backends fail, so plots are always rendered with Agg.
+_executor_lock = threading.Lock()
+matplotlib.use("Agg")
+
+
+def extract_code_block(generated_code):
+    """Strips markdown code fences from an agent reply, if present."""
+    code_to_run = generated_code or ""
     if "```python" in code_to_run:
         code_to_run = code_to_run.split("```python")[1].split("```")[0]
     elif "```" in code_to_run:
         code_to_run = code_to_run.split("```")[1].split("```")[0]
+    return code_to_run
 
-    success, error = executor.run(code_to_run)
 
-    if not success:
-        print(f"Code execution failed: {error}")
-        # Retry with error feedback
-        await code_chat.add_chat_message(
-            message=f"The code failed with error: {error}. Please fix it."
-        )
-        async for content in code_chat.invoke():
-            log_agent_message(content)
-            generated_code = content.content
+def run_executor(executor, code):
+    """Runs generated code with the executor while holding the plotting lock."""
+    with _executor_lock:
+        return executor.run(code)
+
+
+def prompt_for_approval(analysis_result):
+    """Asks the user on the console whether the analysis may continue."""
+    print("\n--- Analysis Complete ---")
+    print("Please review the analysis results above.")
+    approval = input("Do you approve the cleaned data? (yes/no): ").strip().lower()
+    return approval == "yes"
+
+
+async def run_workflow(csv_path, approve=prompt_for_approval, artifacts_dir="artifacts", use_checkpoints=True,
+                       detector=None, profile=None, checkpoint_dir=None, profile_async=True, auto_approve=False):
+    """Runs the full analysis workflow for a single CSV file.
+
+    The shared kernel, chat service and agents are reused; only the group
+    chats are created fresh, so this can be called repeatedly from one process.
+    Every stage is checkpointed, so a rerun on unchanged inputs resumes after
+    the last completed stage. Analysis and approval checkpoints do not depend
+    on the artifacts directory and can be shared between runs; visualization
+    and report checkpoints are specific to the plot's path. Only human
+    approvals are checkpointed. The run's agent messages are logged to
+    '<artifacts_dir>/agent_chat.log' and the report is built from that file;
+    stages resumed from a checkpoint replay the messages they logged.
+
+    Args:
+        csv_path (str): The path to the CSV file to analyze.
+        approve (callable): Receives the analysis result and returns whether
+            the workflow may continue. May be a coroutine function.
+        artifacts_dir (str, optional): Directory the artifacts are written to.
+            Defaults to 'artifacts'.
+        use_checkpoints (bool, optional): Resume from and write stage
+            checkpoints. Defaults to True.
+        detector (str, optional): The outlier detector to use. Defaults to
+            the dataset's entry in DATASET_DETECTORS, or 'iqr'.
+        profile (str, optional): Profiling modes, see parse_profile_modes().
+            Defaults to the AGENTQUANT_PROFILE environment variable. The
+            bundle is written to '<artifacts_dir>/profiles/'.
+        checkpoint_dir (str, optional): Where checkpoints are stored.
+            Defaults to '<artifacts_dir>/checkpoints'.
+        profile_async (bool, optional): Capture cProfile/tracemalloc data for
+            stages that run on the event loop. Disable it when anything else
+            runs on the loop, such as other runs or a server. Defaults to True.
+        auto_approve (bool, optional): Continue without calling `approve`.
+            Such approvals are not checkpointed, so they never stand in for
+            a human review in a later run. Defaults to False.
+
+    Returns:
+        bool: True if the workflow ran to completion, False if the analysis
+              was not approved.
+    """
+    modes = parse_profile_modes(AGENTQUANT_PROFILE if profile is None else profile)
+    os.makedirs(artifacts_dir, exist_ok=True)
+    checkpoints = CheckpointStore(checkpoint_dir or os.path.join(artifacts_dir, "checkpoints"),
+                                  enabled=use_checkpoints)
+    with run_agent_log(os.path.join(artifacts_dir, "agent_chat.log")) as run_log:
+        if not modes:
+            return await _run_stages(csv_path, approve, auto_approve, artifacts_dir, checkpoints, detector, run_log)
+
+        profiler = StageProfiler(modes, capture_async=profile_async)
+        token = _active_profiler.set(profiler)
+        try:
+            with profiler.span("workflow", capture=False):
+                return await _run_stages(csv_path, approve, auto_approve, artifacts_dir, checkpoints, detector,
+                                         run_log)
+        finally:
+            _active_profiler.reset(token)
+            run_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.path.splitext(os.path.basename(csv_path))[0]}"
+            profile_dir = os.path.join(artifacts_dir, "profiles", run_name)
+            try:
+                await asyncio.to_thread(profiler.write_bundle, profile_dir)
+            finally:
+                profiler.close()
+            print(f"Profile bundle saved to {profile_dir}")
+
+
+async def _run_stages(csv_path, approve, auto_approve, artifacts_dir, checkpoints, detector, run_log):
+    cleaned_data_path = os.path.join(artifacts_dir, "cleaned_data.txt")
+    visualization_path = os.path.join(artifacts_dir, "data_visualization.png")
+    script_path = os.path.join(artifacts_dir, "visualization_script.py")
+    report_path = os.path.join(artifacts_dir, "final_report.md")
+    columnar_dir = os.path.join(artifacts_dir, "columnar")
+    analysis_chat, code_chat, report_chat = create_group_chats()
+    df = outliers = None
+
+    detector = select_detector(csv_path, detector)
+    fingerprint = await asyncio.to_thread(run_profiled, "fingerprint", workflow_fingerprint, csv_path,
+                                          detector=detector)
+    analysis_key = checkpoint_key("analysis", fingerprint)
+    checkpoint = checkpoints.load("analysis", analysis_key)
+
+    if checkpoint is None:
+        log_start = run_log.tell()
+        # 1. Load the CSV data.
+        csv_data = await asyncio.to_thread(run_profiled, "load_csv", load_csv_file, csv_path)
+        df = await asyncio.to_thread(run_profiled, "load_dataframe", load_csv_dataframe, csv_path)
+        print(f"Loaded data from {csv_path}")
+
+        # Outliers are detected locally; the agents work from these results.
+        outliers = await asyncio.to_thread(run_profiled, "detect_outliers", detect_outliers, df, detector)
+        with profile_stage("build_prompt"):
+            cleaning_result = build_cleaning_report(df, outliers, detector)
+            analysis_prompt = (
+                f"Please analyze and clean this CSV data, then compute statistics:\n{csv_data}\n\n"
+                f"Precomputed cleaning results ({detector} method):\n{json.dumps(cleaning_result)}"
+            )
+        print(f"Detected {cleaning_result['removal_summary']['total_outliers_removed']} outlier rows using {detector}")
+
+        # 2. Invoke the analysis chat.
+        print("\n--- Starting Analysis Chat ---")
+        with profile_stage("analysis_chat"):
+            await analysis_chat.add_chat_message(message=analysis_prompt)
+
+            async for content in analysis_chat.invoke():
+                log_agent_message(content)
+                print(f"{content.name}: {content.content[:200]}..." if len(content.content) > 200 else f"{content.name}: {content.content}")
+                analysis_result = content.content
+
+        checkpoints.save("analysis", analysis_key, {"result": analysis_result, "log": run_log.read_from(log_start)})
+    else:
+        print(f"Reusing analysis results for {csv_path} from checkpoint")
+        analysis_result = checkpoint["result"]
+        run_log.replay(checkpoint["log"])
+
+    # 3. Get human approval. Only human approvals are checkpointed, so a
+    # rejected analysis is asked about again on the next run and an automatic
+    # approval never stands in for a review.
+    approval_key = checkpoint_key("approval", analysis_key, analysis_result)
+    if not auto_approve and not checkpoints.load("approval", approval_key):
+        with profile_stage("approval"):
+            approved = approve(analysis_result)
+            if inspect.isawaitable(approved):
+                approved = await approved
+
+        if not approved:
+            print("Analysis not approved. Exiting workflow.")
+            return False
+        checkpoints.save("approval", approval_key, True)
 
-        code_to_run = generated_code
-        if "```python" in code_to_run:
-            code_to_run = code_to_run.split("```python")[1].split("```")[0]
-        elif "```" in code_to_run:
-            code_to_run = code_to_run.split("```")[1].split("```")[0]
+    # 4. Save the cleaned data.
+    print("\n--- Saving Cleaned Data ---")
+    atomic_write(cleaned_data_path, analysis_result)
+    print(f"Cleaned data saved to {cleaned_data_path}")
+
+    # Columnar copies are only rewritten when the inputs or the approved
+    # result changed; approval_key covers both.
+    manifest = read_columnar_manifest(columnar_dir)
+    if manifest.get("fingerprint") != approval_key or manifest.get("version") != COLUMNAR_FORMAT_VERSION:
+        if df is None:
+            df = await asyncio.to_thread(run_profiled, "load_dataframe", load_csv_dataframe, csv_path)
+            outliers = await asyncio.to_thread(run_profiled, "detect_outliers", detect_outliers, df, detector)
+        await asyncio.to_thread(run_profiled, "write_columnar", write_columnar_artifacts,
+                                columnar_dir, df, outliers, detector, approval_key,
+                                approved_row_count(analysis_result))
+        print(f"Columnar tables saved to {columnar_dir}")
 
-        success, error = executor.run(code_to_run)
+    executor = PythonExecutor(max_attempts=3)
+    # The generated code and the report embed the plot's path.
+    visualization_key = checkpoint_key("visualization", approval_key, visualization_path)
+    checkpoint = checkpoints.load("visualization", visualization_key)
+
+    if checkpoint is not None:
+        # Re-running the cached script is cheap and guarantees the plot
+        # matches this analysis rather than whatever was saved last.
+        print("Reusing visualization code from checkpoint")
+        code_to_run = checkpoint["code"]
+        run_log.replay(checkpoint["log"])
+        success, error = await asyncio.to_thread(run_profiled, "visualization", run_executor, executor, code_to_run)
+    else:
+        # 5. Invoke the code chat to generate and execute visualization code.
+        print("\n--- Starting Code Chat ---")
+        log_start = run_log.tell()
+        generated_code = None
+        with profile_stage("code_chat"):
+            await code_chat.add_chat_message(
+                message=f"Generate Python visualization code for this cleaned data. Save the plot to '{visualization_path}':\n{analysis_result}"
+            )
+
+            async for content in code_chat.invoke():
+                log_agent_message(content)
+                print(f"{content.name}: Generated code")
+                generated_code = content.content
+
+        # 6. Execute the code in a retry loop.
+        print("\n--- Executing Visualization Code ---")
+        code_to_run = extract_code_block(generated_code)
+        success, error = await asyncio.to_thread(run_profiled, "visualization", run_executor, executor, code_to_run)
+
+        if not success:
+            print(f"Code execution failed: {error}")
+            # Retry with error feedback
+            with profile_stage("code_chat_retry"):
+                await code_chat.add_chat_message(
+                    message=f"The code failed with error: {error}. Please fix it."
+                )
+                async for content in code_chat.invoke():
+                    log_agent_message(content)
+                    generated_code = content.content
+
+            code_to_run = extract_code_block(generated_code)
+            success, error = await asyncio.to_thread(run_profiled, "visualization", run_executor, executor, code_to_run)
+
+        # Failed code is not checkpointed, so a rerun asks for new code.
+        if success:
+            checkpoints.save("visualization", visualization_key,
+                             {"code": code_to_run, "log": run_log.read_from(log_start)})
 
     if success:
         print("Visualization code executed successfully!")
@@ -688,35 +2034,450 @@ async def main():
 
     # 7. Save the working visualization script.
     print("\n--- Saving Visualization Script ---")
-    with open("artifacts/visualization_script.py", "w") as f:
-        f.write(code_to_run)
-    print("Visualization script saved to artifacts/visualization_script.py")
-
-    # 8. Invoke the report chat to generate the final report.
-    print("\n--- Starting Report Chat ---")
-    logs = load_logs("agent_chat.log")
-    logs_content = "\n".join(logs[-50:])  # Get last 50 log entries
-
-    await report_chat.add_chat_message(
-        message=f"Generate a comprehensive data analysis report based on the following analysis results and agent workflow:\n\nAnalysis Results:\n{analysis_result}\n\nAgent Logs:\n{logs_content}"
-    )
+    atomic_write(script_path, code_to_run)
+    print(f"Visualization script saved to {script_path}")
 
+    report_key = checkpoint_key("report", visualization_key, code_to_run)
+    checkpoint = checkpoints.load("report", report_key)
     final_report = None
-    async for content in report_chat.invoke():
-        log_agent_message(content)
-        print(f"{content.name}: {content.content[:200]}..." if len(content.content) > 200 else f"{content.name}: {content.content}")
-        # Save the report from ReportGenerator, not the "Approved" from ReportChecker
-        if content.name == "ReportGenerator":
-            final_report = content.content
+
+    if checkpoint is None:
+        # 8. Invoke the report chat to generate the final report.
+        print("\n--- Starting Report Chat ---")
+        with profile_stage("build_report_prompt"):
+            logs = load_logs("agent_chat.log", directory=artifacts_dir)
+            logs_content = "\n".join(logs[-50:])  # Get last 50 log entries
+            log_start = run_log.tell()
+            report_prompt = f"Generate a comprehensive data analysis report based on the following analysis results and agent workflow. The visualization is saved at '{visualization_path}'.\n\nAnalysis Results:\n{analysis_result}\n\nAgent Logs:\n{logs_content}"
+
+        with profile_stage("report_chat"):
+            await report_chat.add_chat_message(message=report_prompt)
+
+            async for content in report_chat.invoke():
+                log_agent_message(content)
+                print(f"{content.name}: {content.content[:200]}..." if len(content.content) > 200 else f"{content.name}: {content.content}")
+                # Save the report from ReportGenerator, not the "Approved" from ReportChecker
+                if content.name == "ReportGenerator":
+                    final_report = content.content
+
+        if final_report is not None:
+            checkpoints.save("report", report_key, {"report": final_report, "log": run_log.read_from(log_start)})
+    else:
+        print("Reusing final report from checkpoint")
+        final_report = checkpoint["report"]
+        run_log.replay(checkpoint["log"])
 
     # 9. Save the final report.
     print("\n--- Saving Final Report ---")
-    save_final_report(final_report)
+    with profile_stage("report_write"):
+        save_final_report(final_report, path=report_path)
     print("Workflow completed successfully!")
+    return True
+
+
+async def main(use_checkpoints=True, detector=None, profile=None):
+    """The main entry point for the agentic workflow."""
+    csv_path = get_csv_name()
+    await run_workflow(csv_path, use_checkpoints=use_checkpoints, detector=detector, profile=profile)
+
+
+# -----------------
+# Analysis Service
+# -----------------
+# A long-running daemon that keeps the kernel, chat service and agents loaded
+# and accepts analysis jobs over a small local HTTP API.
+
+# Largest request body the API accepts; job submissions are tiny JSON objects.
+MAX_REQUEST_BODY = 1 << 20
+REQUEST_TIMEOUT = 30
+FINISHED_STATUSES = ("completed", "rejected", "failed")
+
+
+class AnalysisJob:
+    """A single queued analysis request and its current state."""
+    def __init__(self, csv_path, auto_approve=False, artifacts_root="artifacts/jobs", detector=None,
+                 use_checkpoints=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.csv_path = csv_path
+        self.auto_approve = auto_approve
+        self.detector = detector
+        self.use_checkpoints = use_checkpoints
+        self.artifacts_dir = os.path.join(artifacts_root, self.id)
+        self.status = "queued"
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.approval = None
+
+    def to_dict(self):
+        """Returns the job's public state as a JSON-serializable dict."""
+        return {
+            "id": self.id,
+            "csv_path": self.csv_path,
+            "detector": self.detector,
+            "status": self.status,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "artifacts": self.list_artifacts(),
+        }
+
+    def list_artifacts(self):
+        """
+        Lists the file names written to this job's artifacts directory, plus
+        'columnar/manifest.json' once columnar artifacts have been published.
+        """
+        if not os.path.isdir(self.artifacts_dir):
+            return []
+        names = [
+            name for name in os.listdir(self.artifacts_dir)
+            if os.path.isfile(os.path.join(self.artifacts_dir, name))
+        ]
+        if os.path.isfile(os.path.join(self.artifacts_dir, "columnar", "manifest.json")):
+            names.append("columnar/manifest.json")
+        return sorted(names)
+
+    def columnar_file(self, parts):
+        """
+        Resolves a path inside this job's columnar artifacts directory.
+
+        Returns:
+            str | None: The file's path, or None if it does not exist or
+                        would escape the columnar directory.
+        """
+        root = os.path.realpath(os.path.join(self.artifacts_dir, "columnar"))
+        path = os.path.realpath(os.path.join(root, *parts))
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            return None
+        return path
+
+
+class AnalysisService:
+    """
+    Runs analysis jobs from a bounded queue on a fixed pool of async workers.
+
+    Every job reuses the module-level kernel, chat service (and therefore its
+    HTTP connection pool) and agents; only the group chats are per job.
+    Jobs that are not submitted with auto_approve wait in the
+    'awaiting_approval' state until POST /jobs/<id>/approve is received,
+    holding their worker while they wait.
+
+    All jobs share one checkpoint store, so resubmitting a failed job reuses
+    its analysis and approval instead of starting over. Profiled jobs only
+    capture cProfile/tracemalloc data for stages on worker threads: the event
+    loop also serves the HTTP API, so it is never profiled on a job's behalf.
+
+    Only the most recent max_finished_jobs finished jobs are kept in memory;
+    older ones are dropped from /jobs, while their artifacts stay on disk.
+    """
+    def __init__(self, workers=2, queue_size=16, artifacts_root="artifacts/jobs",
+                 checkpoint_dir="artifacts/checkpoints", use_checkpoints=True, profile=None,
+                 max_finished_jobs=256):
+        self.workers = workers
+        self.max_finished_jobs = max_finished_jobs
+        self.profile = profile
+        self.artifacts_root = artifacts_root
+        self.checkpoint_dir = checkpoint_dir
+        self.use_checkpoints = use_checkpoints
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self._worker_tasks = []
+
+    def submit(self, csv_path, auto_approve=False, detector=None, fresh=False):
+        """
+        Queues a new analysis job.
+
+        Args:
+            csv_path (str): A CSV file name or path inside the 'data' directory.
+            auto_approve (bool, optional): Skip the human approval step.
+            detector (str, optional): The outlier detector to use.
+            fresh (bool, optional): Ignore existing checkpoints for this job.
+
+        Returns:
+            AnalysisJob: The queued job.
+
+        Raises:
+            FileNotFoundError: If the CSV file does not exist in 'data'.
+            ValueError: If an argument has the wrong type or the detector is not registered.
+            asyncio.QueueFull: If the job queue is full.
+        """
+        if not isinstance(csv_path, str):
+            raise ValueError("'csv_path' must be a string.")
+        if detector is not None and not isinstance(detector, str):
+            raise ValueError("'detector' must be a string.")
+        csv_path = os.path.join('data', os.path.basename(csv_path))
+        if not csv_path.endswith('.csv') or not os.path.isfile(csv_path):
+            raise FileNotFoundError(f"No CSV file named {os.path.basename(csv_path)} in the 'data' directory.")
+        detector = select_detector(csv_path, detector)
+
+        job = AnalysisJob(csv_path, auto_approve=auto_approve, artifacts_root=self.artifacts_root,
+                          detector=detector, use_checkpoints=self.use_checkpoints and not fresh)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        return job
+
+    def approve(self, job_id, approved):
+        """Resolves the approval step of a job that is waiting for it."""
+        job = self.jobs.get(job_id)
+        if job is None or job.approval is None or job.approval.done():
+            return False
+        job.approval.set_result(bool(approved))
+        return True
+
+    async def _approve(self, job, analysis_result):
+        job.approval = asyncio.get_running_loop().create_future()
+        job.status = "awaiting_approval"
+        try:
+            return await job.approval
+        finally:
+            job.status = "running"
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                completed = await run_workflow(
+                    job.csv_path,
+                    approve=lambda result, job=job: self._approve(job, result),
+                    artifacts_dir=job.artifacts_dir,
+                    detector=job.detector,
+                    use_checkpoints=job.use_checkpoints,
+                    checkpoint_dir=self.checkpoint_dir,
+                    profile=self.profile,
+                    profile_async=False,
+                    auto_approve=job.auto_approve,
+                )
+                job.status = "completed" if completed else "rejected"
+            except Exception as e:
+                logging.exception(f"Analysis job {job.id} failed")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self._prune_jobs()
+                self.queue.task_done()
+
+    def _prune_jobs(self):
+        finished = sorted((job for job in self.jobs.values() if job.status in FINISHED_STATUSES),
+                          key=lambda job: job.finished_at)
+        for job in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self.jobs[job.id]
+
+    def start(self):
+        """Starts the worker pool on the running event loop."""
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancels the worker pool."""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def handle_request(self, method, path, body):
+        """
+        Routes one API request.
+
+        Endpoints:
+            POST /jobs                         {"csv_path": ..., "auto_approve": bool, "detector": ..., "fresh": bool}
+            GET  /jobs                         List all jobs.
+            GET  /jobs/<id>                    Job status.
+            POST /jobs/<id>/approve            {"approved": bool}
+            GET  /jobs/<id>/artifacts/<name>   Download an artifact.
+            GET  /jobs/<id>/artifacts/columnar/<path>
+                                               Download a columnar artifact file.
+            GET  /metrics                      Job queue and chat scheduler metrics.
+
+        Returns:
+            tuple[int, str, bytes]: The HTTP status, content type and body.
+        """
+        parts = [part for part in path.split('?')[0].split('/') if part]
+
+        if parts == ["jobs"] and method == "POST":
+            try:
+                payload = json.loads(body or b"{}")
+                csv_path = payload["csv_path"]
+            except (ValueError, KeyError, TypeError):
+                return _json_response(400, {"error": "Expected a JSON body with a 'csv_path' field."})
+            try:
+                job = self.submit(csv_path, auto_approve=bool(payload.get("auto_approve", False)),
+                                  detector=payload.get("detector"), fresh=bool(payload.get("fresh", False)))
+            except ValueError as e:
+                return _json_response(400, {"error": str(e)})
+            except FileNotFoundError as e:
+                return _json_response(404, {"error": str(e)})
+            except asyncio.QueueFull:
+                return _json_response(503, {"error": "The job queue is full, retry later."})
+            return _json_response(202, job.to_dict())
+
+        if parts == ["metrics"] and method == "GET":
+            return _json_response(200, {
+                "queued_jobs": self.queue.qsize(),
+                "scheduler": request_scheduler.metrics(),
+            })
+
+        if parts == ["jobs"] and method == "GET":
+            return _json_response(200, [job.to_dict() for job in self.jobs.values()])
+
+        job = self.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if job is None:
+            return _json_response(404, {"error": "Not found."})
+
+        if len(parts) == 2 and method == "GET":
+            return _json_response(200, job.to_dict())
+
+        if parts[2:] == ["approve"] and method == "POST":
+            try:
+                approved = json.loads(body or b"{}").get("approved", True)
+            except (ValueError, AttributeError):
+                return _json_response(400, {"error": "Expected a JSON body."})
+            if not self.approve(job.id, approved):
+                return _json_response(409, {"error": "Job is not awaiting approval."})
+            return _json_response(200, job.to_dict())
+
+        if len(parts) == 4 and parts[2] == "artifacts" and method == "GET":
+            name = os.path.basename(parts[3])
+            if name not in job.list_artifacts():
+                return _json_response(404, {"error": f"No artifact named {name}."})
+            data = await asyncio.to_thread(_read_file, os.path.join(job.artifacts_dir, name))
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            return 200, content_type, data
+
+        if len(parts) > 4 and parts[2:4] == ["artifacts", "columnar"] and method == "GET":
+            path = job.columnar_file(parts[4:])
+            if path is None:
+                return _json_response(404, {"error": f"No columnar artifact named {'/'.join(parts[4:])}."})
+            data = await asyncio.to_thread(_read_file, path)
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            return 200, content_type, data
+
+        return _json_response(404, {"error": "Not found."})
+
+    async def _read_request(self, reader):
+        """Reads a request as (method, path, body), or returns an error response (status, ...)."""
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        length = headers.get('content-length', '0') or '0'
+        if len(request_line) < 2:
+            return _json_response(400, {"error": "Malformed request."})
+        if not length.isdigit():
+            return _json_response(400, {"error": "Invalid Content-Length header."})
+        if int(length) > MAX_REQUEST_BODY:
+            return _json_response(413, {"error": "Request body too large."})
+        length = int(length)
+        body = await reader.readexactly(length) if length else b""
+        return request_line[0].upper(), request_line[1], body
+
+    async def handle_connection(self, reader, writer):
+        """Serves a single HTTP/1.1 request and closes the connection."""
+        try:
+            try:
+                request = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                request = _json_response(408, {"error": "Timed out reading the request."})
+            if isinstance(request[0], int):
+                status, content_type, data = request
+            else:
+                status, content_type, data = await self.handle_request(*request)
+
+            reason = HTTPStatus(status).phrase
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n".encode('latin-1') + data
+            )
+            await writer.drain()
+        except Exception:
+            logging.exception("Error handling service request")
+        finally:
+            writer.close()
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _json_response(status, payload):
+    return status, "application/json", json.dumps(payload).encode()
+
+
+async def serve(host="127.0.0.1", port=8765, socket_path=None, workers=2, queue_size=16, use_checkpoints=True,
+                profile=None):
+    """
+    Runs the analysis service until cancelled.
+
+    Args:
+        host (str, optional): Interface to listen on for TCP.
+        port (int, optional): TCP port to listen on.
+        socket_path (str, optional): Listen on this Unix socket instead of TCP.
+        workers (int, optional): Number of jobs processed concurrently.
+        queue_size (int, optional): Maximum number of queued jobs.
+        use_checkpoints (bool, optional): Resume jobs from the shared checkpoint store.
+        profile (str, optional): Profiling modes for every job, see parse_profile_modes().
+    """
+    service = AnalysisService(workers=workers, queue_size=queue_size, use_checkpoints=use_checkpoints,
+                              profile=profile)
+    service.start()
+    if socket_path:
+        server = await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+        print(f"Analysis service listening on unix:{socket_path} with {workers} workers")
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        print(f"Analysis service listening on http://{host}:{port} with {workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def parse_args(argv=None):
+    """Parses the command line options."""
+    parser = argparse.ArgumentParser(description="Agentic data analysis workflow.")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Ignore existing stage checkpoints and rerun every stage.")
+    parser.add_argument("--detector", choices=sorted(OUTLIER_DETECTORS),
+                        help="Outlier detector to use (default: per dataset, see DATASET_DETECTORS).")
+    parser.add_argument("--profile", nargs="?", const="spans", metavar="MODES",
+                        help="Profile each stage; MODES is a comma-separated list of spans, cprofile, "
+                             "tracemalloc, or 'all' (default: spans, or AGENTQUANT_PROFILE).")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a long-lived analysis service instead of a single interactive run.")
+    parser.add_argument("--host", default="127.0.0.1", help="Service host (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Service port (default: 8765).")
+    parser.add_argument("--socket", dest="socket_path", help="Serve on a Unix socket instead of TCP.")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent analysis jobs (default: 2).")
+    parser.add_argument("--queue-size", type=int, default=16, help="Maximum queued jobs (default: 16).")
+    return parser.parse_args(argv)
 
 
 # -----------------
 # Main Execution
 # -----------------
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    if args.serve:
+        asyncio.run(serve(
+            host=args.host,
+            port=args.port,
+            socket_path=args.socket_path,
+            workers=args.workers,
+            queue_size=args.queue_size,
+            use_checkpoints=not args.fresh,
+            profile=args.profile,
+        ))
+    else:
+        asyncio.run(main(use_checkpoints=not args.fresh, detector=args.detector, profile=args.profile))
@@ -0,0 +1,104 @@
+"""Tests for the chat request scheduler against a mocked Azure OpenAI endpoint."""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_KEY", "test")
+os.environ.setdefault("URL", "https://example.invalid/openai/deployments/test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openai import AsyncAzureOpenAI  # noqa: E402
+from semantic_kernel.connectors.ai.open_ai import AzureChatPromptExecutionSettings  # noqa: E402
+from semantic_kernel.contents import ChatHistory  # noqa: E402
+
+from final import RequestScheduler, ScheduledAzureChatCompletion  # noqa: E402
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "test",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "APPROVED"}}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+}
+
+
+def mock_service(scheduler, responses):
+    """Creates a scheduled chat service whose HTTP calls return `responses` in order."""
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        return responses[min(len(calls), len(responses)) - 1]
+
+    client = AsyncAzureOpenAI(
+        api_key="test",
+        base_url="https://example.invalid/openai/deployments/test",
+        api_version="2024-12-01-preview",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    service = ScheduledAzureChatCompletion(deployment_name="test", async_client=client)
+    service.scheduler = scheduler
+    return service, calls
+
+
+async def complete(service):
+    history = ChatHistory()
+    history.add_user_message("Check the analysis.")
+    return await service.get_chat_message_contents(history, AzureChatPromptExecutionSettings())
+
+
+def test_retries_429_and_honors_retry_after():
+    throttled = httpx.Response(429, headers={"Retry-After": "0.2"}, json={"error": {"message": "slow down"}})
+    scheduler = RequestScheduler(max_retries=3, base_delay=0.01)
+    service, calls = mock_service(scheduler, [throttled, throttled, httpx.Response(200, json=COMPLETION)])
+
+    result = asyncio.run(complete(service))
+
+    assert str(result[0].content) == "APPROVED"
+    assert len(calls) == 3
+    assert all(later - earlier >= 0.2 for earlier, later in zip(calls, calls[1:]))
+    assert scheduler.stats["throttled"] == 2
+    assert scheduler.stats["retries"] == 2
+    assert scheduler.stats["failures"] == 0
+
+
+def test_gives_up_after_max_retries():
+    throttled = httpx.Response(429, headers={"Retry-After": "0"}, json={"error": {"message": "slow down"}})
+    scheduler = RequestScheduler(max_retries=2, base_delay=0.01)
+    service, calls = mock_service(scheduler, [throttled])
+
+    with pytest.raises(Exception):
+        asyncio.run(complete(service))
+
+    assert len(calls) == 3
+    assert scheduler.stats["failures"] == 1
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+def test_priority_order_under_rate_limit():
+    async def run():
+        scheduler = RequestScheduler(max_concurrency=4, requests_per_minute=600)
+        scheduler.request_bucket.tokens = 0
+        started = []
+
+        def send(name):
+            async def request():
+                started.append(name)
+                await asyncio.sleep(0.01)
+            return request
+
+        generators = [asyncio.create_task(scheduler.submit(send(f"gen{i}"), priority=2)) for i in range(5)]
+        await asyncio.sleep(0)
+        assert scheduler.metrics()["in_flight"] == 0
+        checker = asyncio.create_task(scheduler.submit(send("checker"), priority=0))
+        await asyncio.gather(checker, *generators)
+        return started
+
+    assert asyncio.run(run()) == ["checker", "gen0", "gen1", "gen2", "gen3", "gen4"]